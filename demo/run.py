@@ -1,8 +1,9 @@
 import logging
 import os
-import random
 import sys
 
+import numpy as np
+
 from mlft.strategy import *
 from mlft.backtest import *
 
@@ -12,6 +13,7 @@ logging.basicConfig(
     format='[%(asctime)s.%(msecs)03d][%(levelname)s][%(name)s] %(message)s',
     datefmt='%Y-%m-%d %H:%M:%S',
 )
+logger = logging.getLogger(__name__)
 
 
 class DemoStrategy(Strategy):
@@ -19,27 +21,40 @@ class DemoStrategy(Strategy):
     Demo strategy showcasing all APIs
     """
 
-    def __init__(self):
+    def __init__(self, n_bars: int = 4096):
         super().__init__(name = "Demo")
+        # random directions and quantities are drawn in blocks of n_bars
+        self._n_bars = n_bars
+        self._rand_dir = np.empty(0, dtype = np.int8)
+        self._rand_qty = np.empty(0, dtype = np.int8)
+        self._i = 0
 
     def on_start(self):
-        logging.info(f"on_start strategy_id={self.name()}")
+        logger.info("on_start strategy_id=%s", self.name())
 
     def on_stop(self):
-        logging.info(f"on_stop strategy_id={self.name()}")
+        logger.info("on_stop strategy_id=%s", self.name())
 
     def on_order_cancelled(self, order: Order):
-        logging.info(f"on_order_cancelled {order=}")
+        if logger.isEnabledFor(logging.INFO):
+            logger.info("on_order_cancelled order=%r", order)
 
     def on_order_executed(self, trade: Trade):
-        logging.info(f"on_order_executed {trade=}")
+        if logger.isEnabledFor(logging.INFO):
+            logger.info("on_order_executed trade=%r", trade)
 
     def on_bar_data(self, ins_id: InstrumentID, bar: BarData):
-        logging.info(f"on_bar_data {ins_id=} {bar=}")
+        if logger.isEnabledFor(logging.INFO):
+            logger.info("on_bar_data ins_id=%r bar=%r", ins_id, bar)
 
         # generate random order
-        random_dir = random.choice([Direction.Buy, Direction.Sell])
-        random_qty = random.randint(1, 5)
+        if self._i == len(self._rand_dir):
+            self._rand_dir = np.random.randint(0, 2, size = self._n_bars, dtype = np.int8)
+            self._rand_qty = np.random.randint(1, 6, size = self._n_bars, dtype = np.int8)
+            self._i = 0
+        random_dir = Direction(self._rand_dir[self._i])
+        random_qty = int(self._rand_qty[self._i])
+        self._i += 1
         self.commands().submit_order(
             ins_id=ins_id,
             dir=random_dir,
@@ -0,0 +1,83 @@
+import hashlib
+import inspect
+import os
+
+from ._njit import njit
+
+__all__ = ['fill_position_py', 'match_always_filled', 'source_hash']
+
+# jit compiled kernels can only be cached when the module is loaded from its sources
+_CACHE = os.path.splitext(__file__)[1] == '.py'
+
+
+def fill_position_py(hold_qty, hold_mv, sign, qty, px, fee_per_qty, fee_per_mv):
+	"""
+	Fill qty at px on a holding position, sign is +1 for buy and -1 for sell,
+	returns (fee, profit, hold_qty, hold_mv) with holding state right after the fill
+	"""
+	close_qty = min(max(-sign * hold_qty, 0.0), qty)
+	avg_px = hold_mv / hold_qty if hold_qty != 0 else 0.0
+	close_ratio = close_qty / abs(hold_qty) if hold_qty != 0 else 0.0
+	# buy closes short position and sell closes long position, without multiplying sign to avoid -0.0
+	if close_qty <= 0:
+		profit = 0.0
+	elif sign > 0:
+		profit = (avg_px - px) * close_qty
+	else:
+		profit = (px - avg_px) * close_qty
+	fee = qty * (fee_per_qty + fee_per_mv * px)
+	return fee, profit, hold_qty + sign * qty, hold_mv * (1 - close_ratio) + sign * (qty - close_qty) * px
+
+
+# the scalar matching path of the engine calls fill_position_py directly as jit dispatch costs more than it saves
+_fill_position = njit(cache = _CACHE)(fill_position_py)
+
+
+def _match_always_filled(order_ins, order_dir, order_pend_qty, hold_qty, hold_mv, fee_per_qty, fee_per_mv,
+                         cur_px, out_px, out_exec_qty, out_fee, out_profit, out_hold_qty, out_hold_mv):
+	"""
+	Fill orders in sequence at current price of their instruments, holding states are updated in place
+	and the holding state right after each fill is written to out_hold_qty / out_hold_mv
+	"""
+	for i in range(len(order_ins)):
+		c = order_ins[i]
+		ev_px = cur_px[c]
+		ev_qty = order_pend_qty[i]
+		ev_fee, ev_profit, hold_qty[c], hold_mv[c] = _fill_position(
+			hold_qty[c], hold_mv[c], 1.0 - 2.0 * order_dir[i], ev_qty, ev_px, fee_per_qty[c], fee_per_mv[c])
+		out_px[i] = ev_px
+		out_exec_qty[i] = ev_qty
+		out_fee[i] = ev_fee
+		out_profit[i] = ev_profit
+		out_hold_qty[i] = hold_qty[c]
+		out_hold_mv[i] = hold_mv[c]
+
+
+# signatures of kernels exported by the ahead-of-time compiled module
+_MATCH_ALWAYS_FILLED_SIG = 'void(i4[:], i1[:], f8[:], f8[:], f8[:], f8[:], f8[:], f8[:], f8[:], f8[:], f8[:], f8[:], f8[:], f8[:])'
+
+match_always_filled = njit(cache = _CACHE)(_match_always_filled)
+
+
+def source_hash() -> int:
+	"""
+	Hash of kernel sources, stored in the ahead-of-time compiled module to detect builds from outdated sources,
+	raises OSError when sources are not available
+	"""
+	src = inspect.getsource(fill_position_py) + inspect.getsource(_match_always_filled) + _MATCH_ALWAYS_FILLED_SIG
+	return int(hashlib.sha1(src.encode()).hexdigest()[:15], 16)
+
+
+if __name__ == '__main__':
+	from numba.pycc import CC
+
+	_SOURCE_HASH = source_hash()
+
+	def _source_hash():
+		return _SOURCE_HASH
+
+	cc = CC('mlft_kernels')
+	cc.output_dir = os.path.dirname(os.path.abspath(__file__))
+	cc.export('match_always_filled', _MATCH_ALWAYS_FILLED_SIG)(_match_always_filled)
+	cc.export('source_hash', 'i8()')(_source_hash)
+	cc.compile()
@@ -0,0 +1,13 @@
+try:
+	from numba import njit
+	HAS_NUMBA = True
+except ImportError:
+	HAS_NUMBA = False
+
+	def njit(*args, **kwargs):
+		"""No-op replacement of numba.njit when numba is not installed"""
+		if len(args) == 1 and callable(args[0]) and not kwargs:
+			return args[0]
+		return lambda func: func
+
+__all__ = ['njit', 'HAS_NUMBA']
@@ -1,19 +1,58 @@
-import datetime as dt
 import logging
+import math
 import os
+from collections import deque
 from dataclasses import dataclass, field
 from enum import IntEnum, unique
-from typing import List, Dict, Optional
+from typing import List, Dict, Deque, Optional, Tuple
 
 import numpy as np
 import pandas as pd
 
 from .strategy import *
 
+from ._kernels import fill_position_py as _fill_position_py
+from ._kernels import match_always_filled as _match_always_filled
+from ._kernels import source_hash as _kernels_source_hash
+from ._njit import HAS_NUMBA as _HAS_COMPILED_KERNELS
+
+try:
+	import pyarrow  # noqa: F401
+	_CSV_ENGINE = 'pyarrow'
+except ImportError:
+	_CSV_ENGINE = 'c'
+
+try:
+	import polars as pl
+except ImportError:
+	pl = None
+
 __all__ = [
     'MatchAlgorithm', 'BacktestConfig', 'BacktestEngine'
 ]
 
+logger = logging.getLogger(__name__)
+
+try:
+	# ahead-of-time compiled kernels built by `python -m mlft._kernels`
+	from . import mlft_kernels as _aot_kernels
+except ImportError:
+	_aot_kernels = None
+if _aot_kernels is not None:
+	try:
+		_aot_kernels_valid = getattr(_aot_kernels, 'source_hash', lambda: None)() == _kernels_source_hash()
+	except OSError:
+		logger.warning('mlft_kernels is ignored as kernel sources are not available to check it against')
+	else:
+		if _aot_kernels_valid:
+			_match_always_filled = _aot_kernels.match_always_filled
+			_HAS_COMPILED_KERNELS = True
+		else:
+			logger.warning('mlft_kernels is built from outdated sources and ignored, rebuild it by `python -m mlft._kernels`')
+
+# minimal number of orders matched in one batch by compiled kernels, smaller batches are matched one by one
+_MIN_BATCH_SIZE = 16
+
 
 @unique
 class MatchAlgorithm(IntEnum):
@@ -22,7 +61,7 @@ class MatchAlgorithm(IntEnum):
 	AlwaysFilled = 1  # Order is always filled
 
 
-@dataclass
+@dataclass(slots = True)
 class BacktestConfig:
 	# instrument file path
 	instrument_path: str
@@ -30,14 +69,77 @@ class BacktestConfig:
 	bar_data_path: str
 	# matching algorithm
 	match_algo: MatchAlgorithm = field(default = MatchAlgorithm.AlwaysFilled)
+	# expected number of orders for preallocation, 2 orders per bar if not set
+	expected_orders: Optional[int] = field(default = None)
+
+
+def _new_columns(cap: int, dtypes: Dict[str, object]) -> Dict[str, np.ndarray]:
+	"""Allocate column arrays with given capacity"""
+	return {k: np.empty(cap, dtype = v) for k, v in dtypes.items()}
 
 
-@dataclass
-class _Event:
-	# event type
-	event_type: int
-	# order or trade
-	order: Order
+def _reserve(cols: Dict[str, np.ndarray], cap: int, size: int) -> int:
+	"""Grow column arrays of capacity cap by doubling until they can hold size rows, returns new capacity"""
+	if size <= cap:
+		return cap
+	while cap < size:
+		cap *= 2
+	for k, v in cols.items():
+		cols[k] = np.resize(v, cap)
+	return cap
+
+
+_ORDER_DTYPES = {
+	'order_id': np.int64,
+	'ins_id': np.int32,
+	'direction': np.int8,
+	'tif': np.int8,
+	'limit_px': np.float64,
+	'orig_qty': np.float64,
+	'pend_qty': np.float64,
+	'exec_qty': np.float64,
+	'insert_time': 'datetime64[ns]',
+	'last_time': 'datetime64[ns]',
+}
+
+_TRADE_DTYPES = {
+	'trade_id': np.int64,
+	'order_id': np.int64,
+	'ins_id': np.int32,
+	'direction': np.int8,
+	'px': np.float64,
+	'qty': np.float64,
+	'fee': np.float64,
+	'profit': np.float64,
+}
+
+
+_BAR_PX_COLUMNS = ['open_px', 'high_px', 'low_px', 'last_px', 'trade_qty', 'trade_mv', 'hold_qty']
+
+
+def _load_bar_data(path: str) -> Dict[str, np.ndarray]:
+	"""Load bar data csv as numpy columns, times are datetime64[ns]"""
+	if pl is not None:
+		df = pl.read_csv(path, encoding = "utf8", schema_overrides = {
+			'ins_id': pl.String,
+			'time': pl.String,
+			'last_time': pl.String,
+			**{x: pl.Float64 for x in _BAR_PX_COLUMNS},
+		})
+		df = df.with_columns(pl.col('time', 'last_time').str.to_datetime(time_unit = 'ns'))
+		return {x: df.get_column(x).to_numpy() for x in df.columns}
+	df = pd.read_csv(path, encoding = "utf8", engine = _CSV_ENGINE, parse_dates = [
+		'time', 'last_time'
+	], dtype = {
+		'ins_id': str,
+		**{x: np.float64 for x in _BAR_PX_COLUMNS},
+	})
+	return {
+		'ins_id': df['ins_id'].to_numpy(),
+		'time': df['time'].to_numpy(dtype = 'datetime64[ns]'),
+		'last_time': df['last_time'].to_numpy(dtype = 'datetime64[ns]'),
+		**{x: df[x].to_numpy(dtype = np.float64) for x in _BAR_PX_COLUMNS},
+	}
 
 
 class BacktestEngine(StrategyCommands):
@@ -46,165 +148,305 @@ class BacktestEngine(StrategyCommands):
 	"""
 
 	def __init__(self, config: BacktestConfig, strategy: Strategy):
-		self._positions: Dict[InstrumentID, Position] = {}
-		self._orders: List[Order] = []
-		self._trades: List[Trade] = []
-		self._events: List[_Event] = []
-		self._cur_tm: dt.datetime = None
-		self._cur_px: Dict[InstrumentID, float] = {}
+		self._positions: List[Position] = []
+		self._ins_code: Dict[InstrumentID, int] = {}
+		self._cur_tm: Optional[np.datetime64] = None
 		# load instruments
-		logging.info(f'load instrument info from: {config.instrument_path}')
+		logger.info('load instrument info from: %s', config.instrument_path)
 		if not os.path.exists(config.instrument_path):
 			raise FileNotFoundError(f"missing instrument file: {config.instrument_path}")
-		ins_df = pd.read_csv(config.instrument_path, encoding = "utf8", dtype = str)
+		ins_df = pd.read_csv(config.instrument_path, encoding = "utf8", engine = 'c', dtype = {
+			'ins_id': str,
+			'px_tick': np.float64,
+			'qty_tick': np.float64,
+			'multiplier': np.float64,
+			'fee_per_qty': np.float64,
+			'fee_per_mv': np.float64,
+			'max_hold_qty': np.float64,
+		})
 		for r in ins_df.itertuples():
-			logging.info(f'add instrument [{r.ins_id}]')
+			logger.info('add instrument [%s]', r.ins_id)
 			ins_id = InstrumentID(r.ins_id)
-			self._positions[ins_id] = \
+			ins_pos = \
 				Position(
 					instrument = InstrumentInfo(
-						ins_id = InstrumentID(r.ins_id),
-						px_tick = float(r.px_tick),
-						qty_tick = float(r.qty_tick),
-						multiplier = float(r.multiplier),
-						fee_per_qty = float(r.fee_per_qty),
-						fee_per_mv = float(r.fee_per_mv),
+						ins_id = ins_id,
+						px_tick = r.px_tick,
+						qty_tick = r.qty_tick,
+						multiplier = r.multiplier,
+						fee_per_qty = r.fee_per_qty,
+						fee_per_mv = r.fee_per_mv,
 					),
-					max_hold_qty = float(r.max_hold_qty),
+					max_hold_qty = r.max_hold_qty,
 				)
+			if ins_id in self._ins_code:
+				self._positions[self._ins_code[ins_id]] = ins_pos
+			else:
+				self._ins_code[ins_id] = len(self._positions)
+				self._positions.append(ins_pos)
+		# position states as columns indexed by instrument code
+		self._ins_ids: List[InstrumentID] = [x.instrument.ins_id for x in self._positions]
+		n_ins = len(self._positions)
+		self._hold_qty = np.zeros(n_ins, dtype = np.float64)
+		self._hold_mv = np.zeros(n_ins, dtype = np.float64)
+		self._pending_qty = np.zeros((n_ins, 2), dtype = np.float64)
+		for i, x in enumerate(self._positions):
+			# position shares pending quantities with engine
+			x.pending_qty = self._pending_qty[i]
+		self._fee_per_qty = np.array([x.instrument.fee_per_qty for x in self._positions], dtype = np.float64)
+		self._fee_per_mv = np.array([x.instrument.fee_per_mv for x in self._positions], dtype = np.float64)
 		# load time bar data from csv
-		logging.info(f'load bar data from: {config.bar_data_path}')
+		logger.info('load bar data from: %s', config.bar_data_path)
 		if not os.path.exists(config.bar_data_path):
 			raise FileNotFoundError(f"missing bar data file: {config.bar_data_path}")
-		bar_df = pd.read_csv(config.bar_data_path, encoding = "utf8", dtype = {
-			'ins_id': str,
-			'time': str,
-			'last_time': str,
-			'open_px': float,
-			'high_px': float,
-			'low_px': float,
-			'last_px': float,
-			'trade_qty': float,
-			'trade_mv': float,
-			'hold_qty': float,
-		})
-		bar_df['time'] = pd.to_datetime(bar_df['time'])
-		bar_df['last_time'] = pd.to_datetime(bar_df['last_time'])
+		bars = _load_bar_data(config.bar_data_path)
+		n_bars = len(bars['ins_id'])
+		# instrument codes of bars, instruments without position are coded after positions
+		ins_strs = [str(x) for x in self._ins_ids]
+		ins_strs += sorted(set(np.unique(bars['ins_id'])).difference(ins_strs))
+		ins_id_table: List[InstrumentID] = self._ins_ids + [InstrumentID(x) for x in ins_strs[n_ins:]]
+		ins_codes = pd.Categorical(bars['ins_id'], categories = ins_strs).codes
+		self._cur_px_arr = np.full(len(ins_strs), np.nan, dtype = np.float64)
+		# order & trade columns, instrument ids are stored as codes
+		cap = max(config.expected_orders or 2 * n_bars, 16)
+		self._orders: List[Optional[Order]] = [None] * cap
+		self._n_orders: int = 0
+		self._order_cap: int = cap
+		self._order_cols = _new_columns(cap, _ORDER_DTYPES)
+		self._n_trades: int = 0
+		self._trade_cap: int = cap
+		self._trade_cols = _new_columns(cap, _TRADE_DTYPES)
+		# orders from this index on are submitted since last bar and wait for matching
+		self._next_match_idx: int = 0
+		# ids of orders submitted before their instruments have a price, matched again on next bar
+		self._retry_ids: List[int] = []
+		# (number of orders submitted before the request, order id) of cancel requests since last bar
+		self._cancel_ids: Deque[Tuple[int, int]] = deque()
 		# backtesting
-		logging.info(f'sending bar data')
+		logger.info('sending bar data')
 		strategy.init(cmd = self)
 		strategy.on_start()
-		for r in bar_df.itertuples(index = False):
-			ins_id = InstrumentID(r.ins_id)
-			bar_args = r._asdict()
-			del bar_args['ins_id']
-			bar = BarData(**bar_args)
-			bar.time = bar.time.to_pydatetime()
-			bar.last_time = bar.last_time.to_pydatetime()
-			self._cur_tm = bar.last_time
-			self._cur_px[ins_id] = bar.last_px
+		time_arr = bars['time']
+		last_time_arr = bars['last_time']
+		open_px_arr = bars['open_px']
+		high_px_arr = bars['high_px']
+		low_px_arr = bars['low_px']
+		last_px_arr = bars['last_px']
+		trade_qty_arr = bars['trade_qty']
+		trade_mv_arr = bars['trade_mv']
+		hold_qty_arr = bars['hold_qty']
+		for i in range(n_bars):
+			last_px = last_px_arr[i]
+			self._cur_tm = last_time_arr[i]
+			self._cur_px_arr[ins_codes[i]] = last_px
 			# process events
-			for _ev in self._events:
-				if _ev.order.pend_qty <= 0:
-					continue
-				_ev.order.last_time = self._cur_tm
-				ev_pos = _ev.order.position
-				ev_qty = _ev.order.pend_qty
-				if _ev.event_type == 0:
-					if config.match_algo == MatchAlgorithm.AlwaysFilled:
-						# fill order
-						ev_px = self._cur_px[ins_id] if ins_id in self._cur_px else np.NaN
-						_ev.order.exec_qty = ev_qty
-						_ev.order.pend_qty = 0
-						ev_pos.pending_qty[_ev.order.direction] -= ev_qty
-						if _ev.order.direction == Direction.Buy:
-							if ev_pos.hold_qty < 0:
-								ev_close_qty = min(-ev_pos.hold_qty, ev_qty)
-								ev_profit = (ev_pos.hold_mv / ev_pos.hold_qty - ev_px) * ev_close_qty
-								ev_pos.hold_mv *= 1 - (ev_close_qty / -ev_pos.hold_qty)
-							else:
-								ev_close_qty = 0
-								ev_profit = 0
-							ev_pos.hold_qty += ev_qty
-							ev_pos.hold_mv += (ev_qty - ev_close_qty) * ev_px
-						else:
-							if ev_pos.hold_qty > 0:
-								ev_close_qty = min(ev_pos.hold_qty, ev_qty)
-								ev_profit = (ev_px - ev_pos.hold_mv / ev_pos.hold_qty) * ev_close_qty
-								ev_pos.hold_mv *= 1 - (ev_close_qty / ev_pos.hold_qty)
-							else:
-								ev_close_qty = 0
-								ev_profit = 0
-							ev_pos.hold_qty -= ev_qty
-							ev_pos.hold_mv -= (ev_qty - ev_close_qty) * ev_px
-						ev_fee = ev_qty * ev_pos.instrument.fee_per_qty + \
-						         ev_qty * ev_px * ev_pos.instrument.fee_per_mv
-						trade = Trade(
-							trade_id = len(self._trades),
-							order = _ev.order,
-							time = self._cur_tm,
-							px = ev_px,
-							qty = ev_qty,
-							fee = ev_fee,
-							profit = ev_profit
-						)
-						self._trades.append(trade)
-						ev_pos.fee += ev_fee
-						ev_pos.real_profit += ev_profit
-						strategy.on_order_executed(trade)
-					elif _ev.order.tif == TimeInForce.IOC:
-						_ev.order.pend_qty = 0
-						ev_pos.pending_qty[_ev.order.direction] -= ev_qty
-						strategy.on_order_cancelled(_ev.order)
-				elif _ev.event_type == 1:
-					_ev.order.pend_qty = 0
-					ev_pos.pending_qty[_ev.order.direction] -= ev_qty
-					strategy.on_order_cancelled(_ev.order)
-				else:
-					raise RuntimeError(f'unknown event type {_ev.event_type}')
-			self._events.clear()
+			if self._next_match_idx < self._n_orders or self._cancel_ids or self._retry_ids:
+				self._process_events(config.match_algo, strategy)
 			# notify bar data
-			strategy.on_bar_data(ins_id = ins_id, bar = bar)
+			bar = BarData(
+				time = time_arr[i],
+				last_time = last_time_arr[i],
+				open_px = open_px_arr[i],
+				high_px = high_px_arr[i],
+				low_px = low_px_arr[i],
+				last_px = last_px,
+				trade_qty = trade_qty_arr[i],
+				trade_mv = trade_mv_arr[i],
+				hold_qty = hold_qty_arr[i],
+			)
+			strategy.on_bar_data(ins_id = ins_id_table[ins_codes[i]], bar = bar)
 		strategy.on_stop()
 		# aggregate data
-		self.orders = pd.DataFrame({
-			'order_id': [x.order_id for x in self._orders],
-			'ins_id': [x.position.instrument.ins_id for x in self._orders],
-			'direction': [x.direction for x in self._orders],
-			'tif': [x.tif for x in self._orders],
-			'limit_px': [x.limit_px for x in self._orders],
-			'orig_qty': [x.orig_qty for x in self._orders],
-			'pend_qty': [x.pend_qty for x in self._orders],
-			'exec_qty': [x.exec_qty for x in self._orders],
-			'insert_time': [x.insert_time for x in self._orders],
-			'last_time': [x.last_time for x in self._orders],
-		})
-		self.trades = pd.DataFrame({
-			'trade_id': [x.trade_id for x in self._trades],
-			'order_id': [x.order.order_id for x in self._trades],
-			'ins_id': [x.order.position.instrument.ins_id for x in self._trades],
-			'direction': [x.order.direction for x in self._trades],
-			'px': [x.px for x in self._trades],
-			'qty': [x.qty for x in self._trades],
-			'fee': [x.fee for x in self._trades],
-			'profit': [x.profit for x in self._trades],
-		})
+		ins_ids = np.array(self._ins_ids, dtype = object)
+		self.orders = pd.DataFrame({k: v[:self._n_orders] for k, v in self._order_cols.items()})
+		self.orders['ins_id'] = ins_ids[self.orders['ins_id'].to_numpy()]
+		self.trades = pd.DataFrame({k: v[:self._n_trades] for k, v in self._trade_cols.items()})
+		self.trades['ins_id'] = ins_ids[self.trades['ins_id'].to_numpy()]
+
+	def _process_events(self, match_algo: MatchAlgorithm, strategy: Strategy):
+		"""Process order submit and cancel requests in the order they are requested, including ones from callbacks"""
+		# orders not matched on previous bars for lack of price go first
+		if self._retry_ids:
+			retry_ids = self._retry_ids
+			self._retry_ids = []
+			for o in retry_ids:
+				self._match_order(o, match_algo, strategy)
+		while True:
+			lo = self._next_match_idx
+			hi = self._cancel_ids[0][0] if self._cancel_ids else self._n_orders
+			if lo < hi:
+				# orders submitted before next cancel request
+				self._next_match_idx = hi
+				self._match_orders(lo, hi, match_algo, strategy)
+			elif self._cancel_ids:
+				o = self._cancel_ids.popleft()[1]
+				if self._orders[o].pend_qty > 0:
+					self._order_cols['last_time'][o] = self._cur_tm
+					self._cancel_order(o, strategy)
+			else:
+				break
+
+	def _match_orders(self, lo: int, hi: int, match_algo: MatchAlgorithm, strategy: Strategy):
+		"""Match orders with ids in [lo, hi)"""
+		if match_algo == MatchAlgorithm.AlwaysFilled and _HAS_COMPILED_KERNELS and hi - lo >= _MIN_BATCH_SIZE:
+			oc = self._order_cols
+			ev_idx = lo + np.flatnonzero(oc['pend_qty'][lo:hi] > 0)
+			if np.isfinite(self._cur_px_arr[oc['ins_id'][ev_idx]]).all():
+				oc['last_time'][ev_idx] = self._cur_tm
+				self._fill_orders(ev_idx, strategy)
+				return
+		for o in range(lo, hi):
+			self._match_order(o, match_algo, strategy)
+
+	def _match_order(self, o: int, match_algo: MatchAlgorithm, strategy: Strategy):
+		"""Match single order"""
+		order = self._orders[o]
+		if order.pend_qty <= 0:
+			return
+		oc = self._order_cols
+		oc['last_time'][o] = self._cur_tm
+		if match_algo != MatchAlgorithm.AlwaysFilled:
+			if order.tif == TimeInForce.IOC:
+				self._cancel_order(o, strategy)
+			else:
+				order.last_time = self._cur_tm
+		elif math.isfinite(self._cur_px_arr[oc['ins_id'][o]]):
+			self._fill_order(o, strategy)
+		else:
+			self._defer_order(o, strategy)
+
+	def _fill_orders(self, idx: np.ndarray, strategy: Strategy):
+		"""Fill orders with current price"""
+		n = len(idx)
+		if n == 0:
+			return
+		oc = self._order_cols
+		ins = oc['ins_id'][idx]
+		direction = oc['direction'][idx]
+		px = np.empty(n, dtype = np.float64)
+		qty = np.empty(n, dtype = np.float64)
+		fee = np.empty(n, dtype = np.float64)
+		profit = np.empty(n, dtype = np.float64)
+		hold_qty = np.empty(n, dtype = np.float64)
+		hold_mv = np.empty(n, dtype = np.float64)
+		_match_always_filled(
+			ins, direction, oc['pend_qty'][idx], self._hold_qty, self._hold_mv, self._fee_per_qty,
+			self._fee_per_mv, self._cur_px_arr, px, qty, fee, profit, hold_qty, hold_mv)
+		oc['exec_qty'][idx] += qty
+		oc['pend_qty'][idx] = 0
+		# store trades
+		t0 = self._n_trades
+		t1 = t0 + n
+		if t1 > self._trade_cap:
+			self._trade_cap = _reserve(self._trade_cols, self._trade_cap, t1)
+		tc = self._trade_cols
+		tc['trade_id'][t0:t1] = np.arange(t0, t1)
+		tc['order_id'][t0:t1] = idx
+		tc['ins_id'][t0:t1] = ins
+		tc['direction'][t0:t1] = direction
+		tc['px'][t0:t1] = px
+		tc['qty'][t0:t1] = qty
+		tc['fee'][t0:t1] = fee
+		tc['profit'][t0:t1] = profit
+		self._n_trades = t1
+		# notify strategy, position is set to its state right after each fill
+		for j, (o, ev_px, ev_qty, ev_fee, ev_profit, ev_hold_qty, ev_hold_mv) in enumerate(zip(
+				idx.tolist(), px.tolist(), qty.tolist(), fee.tolist(), profit.tolist(),
+				hold_qty.tolist(), hold_mv.tolist())):
+			self._notify_fill(
+				strategy, self._orders[o], t0 + j, ev_px, ev_qty, ev_fee, ev_profit, ev_hold_qty, ev_hold_mv)
+
+	def _fill_order(self, o: int, strategy: Strategy):
+		"""Fill single order with current price"""
+		oc = self._order_cols
+		order = self._orders[o]
+		pos = order.position
+		ins = pos.instrument
+		code = oc['ins_id'][o]
+		ev_px = float(self._cur_px_arr[code])
+		ev_qty = float(order.pend_qty)
+		ev_fee, ev_profit, ev_hold_qty, ev_hold_mv = _fill_position_py(
+			pos.hold_qty, pos.hold_mv, 1.0 - 2.0 * order.direction, ev_qty, ev_px, ins.fee_per_qty, ins.fee_per_mv)
+		self._hold_qty[code] = ev_hold_qty
+		self._hold_mv[code] = ev_hold_mv
+		oc['exec_qty'][o] += ev_qty
+		oc['pend_qty'][o] = 0
+		# store trade
+		trade_id = self._n_trades
+		if trade_id == self._trade_cap:
+			self._trade_cap = _reserve(self._trade_cols, self._trade_cap, trade_id + 1)
+		tc = self._trade_cols
+		tc['trade_id'][trade_id] = trade_id
+		tc['order_id'][trade_id] = o
+		tc['ins_id'][trade_id] = code
+		tc['direction'][trade_id] = order.direction
+		tc['px'][trade_id] = ev_px
+		tc['qty'][trade_id] = ev_qty
+		tc['fee'][trade_id] = ev_fee
+		tc['profit'][trade_id] = ev_profit
+		self._n_trades = trade_id + 1
+		self._notify_fill(strategy, order, trade_id, ev_px, ev_qty, ev_fee, ev_profit, ev_hold_qty, ev_hold_mv)
+
+	def _notify_fill(self, strategy: Strategy, order: Order, trade_id: int, ev_px: float, ev_qty: float,
+	                 ev_fee: float, ev_profit: float, ev_hold_qty: float, ev_hold_mv: float):
+		"""Update order and position with a fill and notify strategy"""
+		order.last_time = self._cur_tm
+		order.exec_qty += ev_qty
+		order.pend_qty = 0
+		pos = order.position
+		pos.pending_qty[order.direction] -= ev_qty
+		pos.hold_qty = ev_hold_qty
+		pos.hold_mv = ev_hold_mv
+		pos.fee += ev_fee
+		pos.real_profit += ev_profit
+		trade = Trade(
+			trade_id = trade_id,
+			order = order,
+			time = self._cur_tm,
+			px = ev_px,
+			qty = ev_qty,
+			fee = ev_fee,
+			profit = ev_profit,
+		)
+		strategy.on_order_executed(trade)
+
+	def _defer_order(self, o: int, strategy: Strategy):
+		"""Handle order on instrument without price, IOC order is cancelled and others are matched on next bar"""
+		order = self._orders[o]
+		if order.tif == TimeInForce.IOC:
+			self._cancel_order(o, strategy)
+		else:
+			order.last_time = self._cur_tm
+			self._retry_ids.append(o)
+
+	def _cancel_order(self, o: int, strategy: Strategy):
+		"""Cancel pending quantity of single order"""
+		oc = self._order_cols
+		ev_qty = oc['pend_qty'][o]
+		oc['pend_qty'][o] = 0
+		order = self._orders[o]
+		order.last_time = self._cur_tm
+		order.pend_qty = 0
+		order.position.pending_qty[order.direction] -= ev_qty
+		strategy.on_order_cancelled(order)
 
 	#######################################################################################
 	# Strategy commands impl
 	#######################################################################################
 
 	def get_positions(self) -> List[Position]:
-		return list(self._positions.values())
+		return list(self._positions)
 
 	def find_position(self, ins_id: InstrumentID) -> Position:
-		return self._positions[ins_id] if ins_id in self._positions else None
+		code = self._ins_code.get(ins_id)
+		return None if code is None else self._positions[code]
 
 	def submit_order(self, ins_id: InstrumentID, dir: Direction, qty: float,
 	                 tif: TimeInForce, lmt_px: Optional[float] = None) -> Optional[Order]:
-		ins_pos = self.find_position(ins_id)
-		if ins_pos is None:
+		code = self._ins_code.get(ins_id)
+		if code is None:
 			return None
+		ins_pos = self._positions[code]
 		# check if new order is viable under current position risk settings
 		if dir == Direction.Buy:
 			max_qty = ins_pos.max_hold_qty - ins_pos.hold_qty - ins_pos.pending_qty[dir]
@@ -213,8 +455,9 @@ class BacktestEngine(StrategyCommands):
 		qty = min(qty, max_qty)
 		if qty <= 0:
 			return None
+		order_id = self._n_orders
 		order = Order(
-			order_id = len(self._orders),
+			order_id = order_id,
 			position = ins_pos,
 			direction = dir,
 			tif = tif,
@@ -222,13 +465,28 @@ class BacktestEngine(StrategyCommands):
 			orig_qty = qty,
 			insert_time = self._cur_tm,
 		)
-		self._orders.append(order)
-		ins_pos.pending_qty[dir] += qty
-		self._events.append(_Event(event_type = 0, order = order))
+		if order_id == self._order_cap:
+			self._orders.extend([None] * self._order_cap)
+			self._order_cap = _reserve(self._order_cols, self._order_cap, 2 * self._order_cap)
+		self._orders[order_id] = order
+		# store order columns
+		oc = self._order_cols
+		oc['order_id'][order_id] = order_id
+		oc['ins_id'][order_id] = code
+		oc['direction'][order_id] = dir
+		oc['tif'][order_id] = tif
+		oc['limit_px'][order_id] = np.nan if lmt_px is None else lmt_px
+		oc['orig_qty'][order_id] = qty
+		oc['pend_qty'][order_id] = qty
+		oc['exec_qty'][order_id] = 0
+		oc['insert_time'][order_id] = np.datetime64('NaT') if self._cur_tm is None else self._cur_tm
+		oc['last_time'][order_id] = np.datetime64('NaT')
+		self._n_orders = order_id + 1
+		self._pending_qty[code, dir] += qty
 		return order
 
 	def cancel_order(self, order: Order) -> bool:
 		if order.pend_qty == 0 or order.tif == TimeInForce.IOC:
 			return False
-		self._events.append(_Event(event_type = 1, order = order))
+		self._cancel_ids.append((self._n_orders, order.order_id))
 		return True
@@ -1,10 +1,12 @@
 from __future__ import annotations
 
-import datetime as dt
 from abc import ABC, abstractmethod
 from dataclasses import dataclass, field
+from datetime import datetime
 from enum import IntEnum, unique
-from typing import List, Dict, Optional
+from typing import List, Optional
+
+import numpy as np
 
 __all__ = [
 	'Direction', 'TimeInForce', 'InstrumentID', 'InstrumentInfo',
@@ -12,6 +14,11 @@ __all__ = [
 ]
 
 
+def _to_datetime(t: Optional[np.datetime64]) -> Optional[datetime]:
+	"""Convert numpy datetime64 to python datetime of microsecond precision"""
+	return None if t is None or np.isnat(t) else t.astype('datetime64[us]').item()
+
+
 @unique
 class Direction(IntEnum):
 	Buy = 0
@@ -24,10 +31,12 @@ class TimeInForce(IntEnum):
 	GTC = 1  # good till cancel
 
 
-@dataclass
+@dataclass(slots = True)
 class InstrumentID:
 	exchange: str
 	symbol: str
+	_str: str = field(init = False, repr = False, compare = False)
+	_hash: int = field(init = False, repr = False, compare = False)
 
 	def __init__(self, ins_id_str: str):
 
@@ -37,18 +46,20 @@ class InstrumentID:
 			self.symbol = split[1]
 		else:
 			raise ValueError(f"Malformed {ins_id_str=}. Should be like SHFE.CU2105")
+		self._str = f"{self.exchange}.{self.symbol}"
+		self._hash = hash(self._str)
 
 	def __str__(self) -> str:
-		return f"{str(self.exchange)}.{str(self.symbol)}"
+		return self._str
 
 	def __repr__(self):
-		return str(self)
+		return self._str
 
 	def __hash__(self):
-		return hash(str(self))
+		return self._hash
 
 
-@dataclass
+@dataclass(slots = True)
 class InstrumentInfo:
 	# instrument id
 	ins_id: InstrumentID
@@ -64,12 +75,12 @@ class InstrumentInfo:
 	fee_per_mv: float
 
 
-@dataclass
+@dataclass(slots = True)
 class BarData:
 	# create time
-	time: dt.datetime
+	time: np.datetime64
 	# last updated time
-	last_time: dt.datetime
+	last_time: np.datetime64
 	# open price
 	open_px: float
 	# highest price
@@ -85,8 +96,18 @@ class BarData:
 	# last market holding quantity
 	hold_qty: float
 
+	@property
+	def py_time(self) -> datetime:
+		"""Create time as python datetime"""
+		return _to_datetime(self.time)
+
+	@property
+	def py_last_time(self) -> datetime:
+		"""Last updated time as python datetime"""
+		return _to_datetime(self.last_time)
 
-@dataclass
+
+@dataclass(slots = True)
 class Position:
 	# instrument info
 	instrument: InstrumentInfo
@@ -96,16 +117,15 @@ class Position:
 	hold_qty: float = field(init = False, default = 0)
 	# market value of holding position
 	hold_mv: float = field(init = False, default = 0)
-	# quantity of pending orders
-	pending_qty: Dict[Direction, float] = field(
-		init = False, default_factory = lambda: {x: 0 for x in [Direction.Buy, Direction.Sell]})
+	# quantity of pending orders, indexed by direction
+	pending_qty: np.ndarray = field(init = False, default_factory = lambda: np.zeros(2, dtype = np.float64))
 	# profit of closed position
 	real_profit: float = field(init = False, default = 0)
 	# fee of session's orders and trades
 	fee: float = field(init = False, default = 0)
 
 
-@dataclass
+@dataclass(slots = True)
 class Order:
 	# order unique id
 	order_id: int
@@ -124,31 +144,41 @@ class Order:
 	# executed quantity
 	exec_qty: float = field(init = False, default = 0)
 	# order insert time
-	insert_time: dt.datetime = field(default = None)
+	insert_time: np.datetime64 = field(default = None)
 	# order last time
-	last_time: dt.datetime = field(init = False, default = None)
+	last_time: np.datetime64 = field(init = False, default = None)
 
 	def __post_init__(self):
 		self.pend_qty = self.orig_qty
 
-	def _on_cancelled(self, time: dt.datetime):
+	@property
+	def py_insert_time(self) -> Optional[datetime]:
+		"""Order insert time as python datetime"""
+		return _to_datetime(self.insert_time)
+
+	@property
+	def py_last_time(self) -> Optional[datetime]:
+		"""Order last time as python datetime"""
+		return _to_datetime(self.last_time)
+
+	def _on_cancelled(self, time: np.datetime64):
 		self.last_time = time
 		self.pend_qty = 0
 
-	def _on_executed(self, time: dt.datetime, qty: float):
+	def _on_executed(self, time: np.datetime64, qty: float):
 		self.last_time = time
 		self.pend_qty -= qty
 		self.exec_qty += qty
 
 
-@dataclass
+@dataclass(slots = True)
 class Trade:
 	# trade unique id
 	trade_id: int
 	# belonging order
 	order: Order
 	# executed time
-	time: dt.datetime
+	time: np.datetime64
 	# executed price
 	px: float
 	# executed qty
@@ -158,6 +188,11 @@ class Trade:
 	# profit
 	profit: float
 
+	@property
+	def py_time(self) -> datetime:
+		"""Executed time as python datetime"""
+		return _to_datetime(self.time)
+
 
 class StrategyCommands(ABC):
 	"""